@@ -19,11 +19,55 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-from .postgres.__init__ import __all__ as postgres_all
-from .mongo.__init__ import __all__ as mongo_all
-from .cosmosdb.__init__ import __all__ as cosmosdb_all
-from .misc.__init__ import __all__ as misc_all
+import importlib
+
+# public names and the subpackages providing them; a subpackage is only imported when one of its names is first
+# accessed, so using one database doesn't require importing the drivers for the others
+_LAZY = {
+    # postgres
+    'PostgresDb': 'db_toolkit.postgres',
+    'does_table_exist_sql': 'db_toolkit.postgres',
+    'count_sql': 'db_toolkit.postgres',
+    'estimate_count_sql': 'db_toolkit.postgres',
+    'fast_count_sql': 'db_toolkit.postgres',
+    'drop_table_sql': 'db_toolkit.postgres',
+    # mongo
+    'MongoDb': 'db_toolkit.mongo',
+    # cosmosdb
+    'CosmosDb': 'db_toolkit.cosmosdb',
+    'select': 'db_toolkit.cosmosdb',
+    'select_template': 'db_toolkit.cosmosdb',
+    'select_parameterised': 'db_toolkit.cosmosdb',
+    'selection_key': 'db_toolkit.cosmosdb',
+    'property_quote_if': 'db_toolkit.cosmosdb',
+    # misc
+    'load_cfg_file': 'db_toolkit.misc',
+    'load_cfg_filename': 'db_toolkit.misc',
+    'load_yaml': 'db_toolkit.misc',
+    'get_file_path': 'db_toolkit.misc',
+    'get_dir_path': 'db_toolkit.misc',
+    'test_file_path': 'db_toolkit.misc',
+    'test_dir_path': 'db_toolkit.misc',
+}
 
 # if somebody does "from db_toolkit import *", this is what they will
 # be able to access:
-__all__ = postgres_all + mongo_all + cosmosdb_all + misc_all
+__all__ = list(_LAZY.keys())
+
+
+def __getattr__(name):
+    """
+    Import the subpackage providing the specified name, on first access
+    :param name: name to retrieve
+    :return: named object
+    """
+    module_name = _LAZY.get(name)
+    if module_name is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value     # cache so __getattr__ isn't called again
+    return value
+
+
+def __dir__():
+    return sorted(set(globals().keys()) | set(__all__))
@@ -19,19 +19,62 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import asyncio
 import logging
-
-import azure.cosmos.documents as documents
-import azure.cosmos.errors as errors
-import azure.cosmos.http_constants as http_constants
-from azure.cosmos.cosmos_client import CosmosClient
+from concurrent.futures import ThreadPoolExecutor
+from functools import (
+    lru_cache,
+    partial
+)
+from types import MappingProxyType
+
+import azure.cosmos.exceptions as exceptions
+import requests
+from azure.core.pipeline.transport import RequestsTransport
+from azure.cosmos import (
+    CosmosClient,
+    PartitionKey
+)
+from requests.adapters import HTTPAdapter
 
 from .cosmosdb_sql import ALIAS
 from .cosmosdb_sql import select
+from .cosmosdb_sql import select_parameterised
 from db_toolkit.misc.config_reader import load_cfg_file
 from db_toolkit.misc.config_reader import load_cfg_filename
+from db_toolkit.misc.config_reader import CFG_BUFFER_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+# default keyword arguments for ContainerProxy.query_items()
+_DEFAULT_QUERY_OPTIONS = MappingProxyType({'enable_cross_partition_query': True})
+
+POOL_MAXSIZE = 64   # default maximum number of connections to keep in the connection pool
 
-logging.basicConfig(level=logging.DEBUG)
+DELETE_BATCH_SIZE = 100     # max number of operations in a transactional batch
+PAGE_SIZE = 1000            # default max number of items to fetch per page when iterating query results
+
+
+@lru_cache(maxsize=32)
+def _get_client(endpoint, key, session=None, pool_maxsize=POOL_MAXSIZE):
+    """
+    Get a client for the specified database account
+    Clients hold the connection pool and metadata caches, so a single client is shared between all objects using
+    the same account.
+    :param endpoint: URI of the database account
+    :param key: primary key of the database account
+    :param session: Optional requests.Session to use for the client's connections
+    :param pool_maxsize: Maximum number of connections to keep in the connection pool, if session not specified
+    :return: client
+    :rtype: CosmosClient
+    """
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+        session.mount('https://', adapter)
+    transport = RequestsTransport(session=session, session_owner=False)
+    return CosmosClient(endpoint, credential=key, transport=transport)
 
 
 class CosmosDb:
@@ -47,9 +90,25 @@ class CosmosDb:
         'dbname',           # name of the database
         'container_name'    # name of the database container
     )
+    _KEYS_SET = frozenset(KEYS)
+    CFG_BUFFER_SIZE = CFG_BUFFER_SIZE   # read buffer size for configuration files, may be overridden
+
+    __slots__ = KEYS + (
+        'partition_key',
+        'pool_maxsize',
+        'client',
+        '_db_link',
+        '_container_link',
+        '_docs_link_prefix',
+        '_database',
+        '_container',
+        '_upsert_one',
+        '_delete_one',
+    )
 
     def __init__(self, cfg_filename=None, cfg_dict=None,
-                 endpoint=None, key=None, dbname=None, container_name=None, test=False):
+                 endpoint=None, key=None, dbname=None, container_name=None, test=False,
+                 session=None, pool_maxsize=POOL_MAXSIZE):
         """
         Initialise object
         :param cfg_filename: Path of configuration file
@@ -59,25 +118,36 @@ class CosmosDb:
         :param dbname: name of the database
         :param container_name: name of the database container
         :param test: test mode flag; default False
+        :param session: Optional requests.Session to use for connections, e.g. with a custom HTTPAdapter mounted
+        :param pool_maxsize: Maximum number of connections to keep in the connection pool, if session not specified;
+                             default POOL_MAXSIZE
         """
         self.endpoint = endpoint
         self.key = key
         self.dbname = dbname
         self.container_name = container_name
         self.partition_key = None
+        self.pool_maxsize = pool_maxsize
+        self._db_link = None            # cached (dbname, link) of last database link
+        self._container_link = None     # cached (dbname, container name, link) of last container link
+        self._docs_link_prefix = None   # cached (dbname, container name, prefix) of last document link prefix
+        self._database = None           # cached (dbname, client) of last database client
+        self._container = None          # cached (dbname, container name, client) of last container client
+        self._upsert_one = None         # upsert function specialised by freeze()
+        self._delete_one = None         # delete function specialised by freeze()
         if cfg_filename is not None:
             self._load_cfg_filename(cfg_filename)
         elif cfg_dict is not None:
             self.__set_config(cfg_dict)
 
         # check for missing required keys
-        for key in CosmosDb.REQUIRED_KEYS:
-            if self[key] is None:
-                raise ValueError(f'Missing {key} configuration')
+        missing = [key for key in CosmosDb.REQUIRED_KEYS if getattr(self, key) is None]
+        if len(missing) > 0:
+            raise ValueError(f'Missing {missing[0]} configuration')
 
         # if not in test mode, create client
         if not test:
-            self.client = CosmosClient(self.endpoint, {'masterKey': self.key})
+            self.client = _get_client(self.endpoint, self.key, session=session, pool_maxsize=pool_maxsize)
 
     def __set_config(self, config):
         """
@@ -85,7 +155,7 @@ class CosmosDb:
         :param config: dict with settings
         """
         for key in config.keys():
-            if key in CosmosDb.KEYS:
+            if key in CosmosDb._KEYS_SET:
                 self[key] = config[key]
 
     def _load_cfg_file(self, cfg_file):
@@ -100,7 +170,7 @@ class CosmosDb:
         Read settings from specified configuration file
         :param cfg_filename: Path of configuration file to load
         """
-        self.__set_config(load_cfg_filename(cfg_filename, CosmosDb.KEYS))
+        self.__set_config(load_cfg_filename(cfg_filename, CosmosDb.KEYS, buffering=self.CFG_BUFFER_SIZE))
 
     def make_db_link(self, name=None):
         """
@@ -113,8 +183,12 @@ class CosmosDb:
             name = self.dbname
         if name is None:
             raise ValueError('Database name not configured')
+        if self._db_link is not None and self._db_link[0] == name:
+            return self._db_link[1]
         link = f'dbs/{name}'
-        logging.debug(link)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(link)
+        self._db_link = (name, link)
         return link
 
     def make_container_link(self, name=None, dbname=None):
@@ -129,8 +203,14 @@ class CosmosDb:
             name = self.container_name
         if name is None:
             raise ValueError('Container name not configured')
+        if dbname is None:
+            dbname = self.dbname
+        if self._container_link is not None and self._container_link[:2] == (dbname, name):
+            return self._container_link[2]
         link = f'{self.make_db_link(name=dbname)}/colls/{name}'
-        logging.debug(link)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(link)
+        self._container_link = (dbname, name, link)
         return link
 
     def make_doc_link(self, doc_id, container_name=None, dbname=None):
@@ -141,19 +221,49 @@ class CosmosDb:
         :param dbname: Optional database name, default is instance name
         :return: container link
         """
-        link = f'{self.make_container_link(name=container_name, dbname=dbname)}/docs/{doc_id}'
-        logging.debug(link)
-        return link
+        if container_name is None:
+            container_name = self.container_name
+        if dbname is None:
+            dbname = self.dbname
+        if self._docs_link_prefix is None or self._docs_link_prefix[:2] != (dbname, container_name):
+            prefix = self.make_container_link(name=container_name, dbname=dbname) + '/docs/'
+            self._docs_link_prefix = (dbname, container_name, prefix)
+        return f'{self._docs_link_prefix[2]}{doc_id}'
+
+    def get_database(self):
+        """
+        Get the client for the configured database
+        :return: database client
+        :rtype: azure.cosmos.DatabaseProxy
+        """
+        name = self.dbname
+        if name is None:
+            raise ValueError('Database name not configured')
+        if self._database is None or self._database[0] != name:
+            self._database = (name, self.client.get_database_client(name))
+        return self._database[1]
+
+    def get_container(self):
+        """
+        Get the client for the configured container
+        :return: container client
+        :rtype: azure.cosmos.ContainerProxy
+        """
+        name = self.container_name
+        if name is None:
+            raise ValueError('Container name not configured')
+        if self._container is None or self._container[:2] != (self.dbname, name):
+            self._container = (self.dbname, name, self.get_database().get_container_client(name))
+        return self._container[2]
 
     def create_database(self):
         """
         Create the database, if it does not already exit
-        :return:
+        :return: database client
+        :rtype: azure.cosmos.DatabaseProxy
         """
-        try:
-            database = self.client.CreateDatabase({'id': self.dbname})
-        except errors.HTTPFailure:
-            database = self.client.ReadDatabase(self.make_db_link())
+        database = self.client.create_database_if_not_exists(id=self.dbname)
+        self._database = (self.dbname, database)
         return database
 
     def database_exists(self):
@@ -163,45 +273,37 @@ class CosmosDb:
         :rtype: bool
         """
         try:
-            database = self.client.ReadDatabase(self.make_db_link())
-        except errors.HTTPFailure as e:
-            if e.status_code == http_constants.StatusCodes.NOT_FOUND:
-                database = None
-            else:
-                raise e
-        return database is not None
+            self.get_database().read()
+            exists = True
+        except exceptions.CosmosResourceNotFoundError:
+            exists = False
+        return exists
 
     def create_container(self, partition_path='/id'):
         """
         Create the container, if it does not already exit
-        :param partition_path: The document path(s) to use as the partition key
-        :return:
+        :param partition_path: The document path, or iterable of paths, to use as the partition key
+        :return: container client
+        :rtype: azure.cosmos.ContainerProxy
         """
         if self.container_name is None:
             raise ValueError('Container name not configured')
 
-        if isinstance(partition_path, str):
-            partition_path_list = [partition_path]
-        elif isinstance(partition_path, list):
-            partition_path_list = partition_path
-        else:
+        try:
+            partition_path_list = [partition_path] if isinstance(partition_path, str) else list(partition_path)
+        except TypeError:
             raise ValueError(f'Invalid partition path configuration: expected str or list, got {type(partition_path)}')
 
-        self.partition_key = {
-            'paths': partition_path_list,
-            'kind': documents.PartitionKind.Hash
-        }
-
-        container_definition = {'id': self.container_name,
-                                'partitionKey': self.partition_key}
-        try:
-            container = self.client.CreateContainer(self.make_db_link(), container_definition, {'offerThroughput': 400})
-        except errors.HTTPFailure as e:
-            if e.status_code == http_constants.StatusCodes.CONFLICT:
-                container = self.client.ReadContainer(self.make_container_link())
-            else:
-                raise e
+        # a single path is a hash partition key, multiple paths a hierarchical partition key
+        if len(partition_path_list) == 1:
+            self.partition_key = PartitionKey(path=partition_path_list[0])
+        else:
+            self.partition_key = PartitionKey(path=partition_path_list, kind='MultiHash')
 
+        container = self.get_database().create_container_if_not_exists(id=self.container_name,
+                                                                        partition_key=self.partition_key,
+                                                                        offer_throughput=400)
+        self._container = (self.dbname, self.container_name, container)
         return container
 
     def container_exists(self):
@@ -211,14 +313,11 @@ class CosmosDb:
         :rtype: bool
         """
         try:
-            container = self.client.ReadContainer(self.make_container_link())
-        except errors.HTTPFailure as e:
-            if e.status_code == http_constants.StatusCodes.NOT_FOUND:
-                container = None
-            else:
-                raise e
-
-        return container is not None
+            self.get_container().read()
+            exists = True
+        except exceptions.CosmosResourceNotFoundError:
+            exists = False
+        return exists
 
     def upsert_item(self, item):
         """
@@ -227,25 +326,50 @@ class CosmosDb:
         :return: The upserted Document.
         :rtype: dict
         """
-        # https://docs.microsoft.com/en-ie/python/api/azure-cosmos/azure.cosmos.cosmos_client.cosmosclient?view=azure-python#upsertitem-database-or-container-link--document--options-none-
-        return self.client.UpsertItem(self.make_container_link(), item)
+        if self._upsert_one is not None:
+            return self._upsert_one(item)
+        # https://docs.microsoft.com/en-us/python/api/azure-cosmos/azure.cosmos.containerproxy?view=azure-python#azure-cosmos-containerproxy-upsert-item
+        return self.get_container().upsert_item(item)
 
-    def query_items_sql(self, query, options=None, partition_key=None):
+    def freeze(self):
+        """
+        Specialise the per-document operations for the currently configured database and container
+        The container client is bound into the operations, so this should only be called once the database and
+        container names are final. Changing either name afterwards requires calling freeze() or thaw().
+        """
+        container = self.get_container()
+        self._upsert_one = container.upsert_item
+        self._delete_one = container.delete_item
+
+    def thaw(self):
+        """
+        Remove the specialised per-document operations set by freeze()
+        """
+        self._upsert_one = None
+        self._delete_one = None
+
+    def query_items_sql(self, query, options=None, partition_key=None, parameters=None):
         """
         Perform a query
         See https://docs.microsoft.com/en-ie/azure/cosmos-db/sql-query-getting-started
         :param query: SQL query string
-        :param options: The request options for the request (default value None)
+        :param options: dict of keyword arguments for ContainerProxy.query_items(), e.g. {'max_item_count': 100};
+                        default None enables cross partition queries
         :param partition_key: Partition key for the query (default value None)
-        :return: List of json objects
-        :rtype: List
+        :param parameters: list of query parameters, e.g. [{'name': '@id', 'value': 'AndersenFamily'}]
+                           (default value None)
+        :return: Iterable of json objects
+        :rtype: Iterable
         """
-        # https://docs.microsoft.com/en-ie/python/api/azure-cosmos/azure.cosmos.cosmos_client.cosmosclient?view=azure-python#queryitems-database-or-container-link--query--options-none--partition-key-none-
+        # https://docs.microsoft.com/en-us/python/api/azure-cosmos/azure.cosmos.containerproxy?view=azure-python#azure-cosmos-containerproxy-query-items
         if options is None:
-            options = {'enableCrossPartitionQuery': True}
-        return self.client.QueryItems(self.make_container_link(), query, options=options, partition_key=partition_key)
+            options = _DEFAULT_QUERY_OPTIONS
+        if partition_key is not None:
+            options = dict(options, partition_key=partition_key)
+        return self.get_container().query_items(query, parameters=parameters, **options)
 
-    def query_items(self, selection, alias=ALIAS, project=None, where=None, options=None, partition_key=None):
+    def query_items(self, selection, alias=ALIAS, project=None, where=None, options=None, partition_key=None,
+                    parameters=None):
         """
         Perform a query
         See https://docs.microsoft.com/en-ie/azure/cosmos-db/sql-query-getting-started
@@ -256,56 +380,186 @@ class CosmosDb:
         :param alias:
         :param project:
         :param where: dict with 'key' as the property and 'value' as the required value for the
-        :param options: The request options for the request (default value None)
+        :param options: dict of keyword arguments for ContainerProxy.query_items(); default None enables cross
+                        partition queries
         :param partition_key: Partition key for the query (default value None)
-        :return: List of json objects
-        :rtype: List
+        :param parameters: dict with 'key' as the property and 'value' as the required value, passed as query
+                           parameters rather than SQL; may not be combined with where
+        :return: Iterable of json objects; results are fetched lazily page by page as it is iterated, so wrap it in
+                 list() if all the results are required at once
+        :rtype: Iterable
+        """
+        if parameters is None:
+            query = select(self.container_name, selection, alias=alias, project=project, where=where)
+            query_params = None
+        elif where is not None:
+            raise ValueError('Only one of where and parameters may be specified')
+        else:
+            # the statement only depends on the shape of the query, so may be shared between calls
+            query, param_names = select_parameterised(self.container_name, selection, alias=alias, project=project,
+                                                      where_keys=tuple(parameters.keys()))
+            query_params = [{'name': name, 'value': value}
+                            for name, value in zip(param_names, parameters.values())]
+        return self.query_items_sql(query, options=options, partition_key=partition_key, parameters=query_params)
+
+    def iter_items(self, selection='*', where=None, page_size=PAGE_SIZE, partition_key=None, parameters=None):
+        """
+        Iterate over the results of a query, fetching them page by page
+        See query_items()
+        :param selection: entries to select; default '*'
+        :param where: dict with 'key' as the property and 'value' as the required value for the
+        :param page_size: max number of items to fetch per page; default PAGE_SIZE
+        :param partition_key: Partition key for the query (default value None)
+        :param parameters: dict with 'key' as the property and 'value' as the required value, passed as query
+                           parameters
+        :return: generator of json objects
         """
-        return self.query_items_sql(select(self.container_name, selection, alias=alias, project=project, where=where),
-                                    options=options, partition_key=partition_key)
+        options = dict(_DEFAULT_QUERY_OPTIONS, max_item_count=page_size)
+        yield from self.query_items(selection, where=where, options=options, partition_key=partition_key,
+                                    parameters=parameters)
 
     def delete_items(self, partition_key, where=None):
         """
         Delete an item(s) from the database
+        Items are deleted in transactional batches, falling back to concurrent individual deletes if a batch fails.
         :param partition_key: value of partition path for container; e.g. partition path = '/day', partition path = 'monday'
-        :param where:
-        :return:
+        :param where: dict of conditions the items must match; default None deletes all items in the partition
+        :return: list of ids of deleted items
         """
         # The SQL API in Cosmos DB does not support the SQL DELETE statement.
         deleted_items = []
-        link = ''
+        doc_id = ''
         try:
-            for item in self.query_items('*', where=where, options={'enableCrossPartitionQuery': True}):
-                link = self.make_doc_link(item['id'])
-                # TODO DeleteItem is supposed to return the deleted doc but only seems to be returning None
-                deleted = self.client.DeleteItem(link, {'partitionKey': partition_key})
-                deleted_items.append(deleted)
-        except errors.HTTPFailure as e:
-            if e.status_code == http_constants.StatusCodes.NOT_FOUND:
-                logging.warning(f'Delete NOT_FOUND: {link} on partition "{partition_key}"')
-                logging.warning(f' Valid partition keys are: {self.partition_key["paths"]}')
-                deleted_items = []
-            else:
-                raise e
+            container = self.get_container()
+            # drain the query before deleting, so query paging and deletes don't compete for connections
+            # only the ids are needed, so don't fetch whole documents, and only items in the partition can be deleted,
+            # so restrict the query to it rather than fanning out across all partitions
+            query = select(self.container_name, ['id'], where=where)
+            ids = [item['id'] for item in container.query_items(query, partition_key=partition_key,
+                                                                max_item_count=PAGE_SIZE)]
+
+            processed = self._batch_delete(container, ids, partition_key, deleted_items)
+
+            remaining = ids[processed:]
+            if len(remaining) > 0:
+                delete_one = self._delete_one if self._delete_one is not None else container.delete_item
+                with ThreadPoolExecutor(max_workers=min(len(remaining), self.pool_maxsize)) as executor:
+                    futures = [executor.submit(delete_one, doc_id, partition_key=partition_key)
+                               for doc_id in remaining]
+                    for doc_id, future in zip(remaining, futures):
+                        future.result()
+                        deleted_items.append(doc_id)
+        except exceptions.CosmosResourceNotFoundError:
+            logger.warning(f'Delete NOT_FOUND: {self.make_doc_link(doc_id)} on partition "{partition_key}"')
+            if self.partition_key is not None:
+                logger.warning(f' Valid partition keys are: {self.partition_key["paths"]}')
+            deleted_items = []
 
         return deleted_items
 
+    @staticmethod
+    def _batch_delete(container, ids, partition_key, deleted_items):
+        """
+        Delete items using transactional batches
+        :param container: container client
+        :param ids: list of ids of items to delete
+        :param partition_key: value of partition path for the items
+        :param deleted_items: list to add the ids of deleted items to
+        :return: number of ids processed
+        :rtype: int
+        """
+        processed = 0
+        while processed < len(ids):
+            batch = ids[processed:processed + DELETE_BATCH_SIZE]
+            try:
+                container.execute_item_batch([('delete', (doc_id,)) for doc_id in batch],
+                                             partition_key=partition_key)
+            except (exceptions.CosmosBatchOperationError, exceptions.CosmosHttpResponseError) as e:
+                # a batch is all or nothing, so the whole batch is still to be deleted
+                logger.warning(f'Batch delete failed, continuing with individual deletes: {e}')
+                break
+
+            deleted_items.extend(batch)
+            processed += len(batch)
+
+        return processed
+
+    async def aupsert_item(self, item):
+        """
+        Asynchronously upsert a document in a collection
+        :param item: document to upsert
+        :return: The upserted Document.
+        :rtype: dict
+        """
+        return await self._run_async(self.upsert_item, item)
+
+    async def aquery_items_sql(self, query, options=None, partition_key=None, parameters=None):
+        """
+        Asynchronously perform a query
+        See query_items_sql()
+        :param query: SQL query string
+        :param options: dict of keyword arguments for ContainerProxy.query_items() (default value None)
+        :param partition_key: Partition key for the query (default value None)
+        :param parameters: list of query parameters (default value None)
+        :return: List of json objects
+        :rtype: List
+        """
+        return await self._run_async(
+            lambda: list(self.query_items_sql(query, options=options, partition_key=partition_key,
+                                              parameters=parameters)))
+
+    async def aquery_items(self, selection, alias=ALIAS, project=None, where=None, options=None, partition_key=None,
+                           parameters=None):
+        """
+        Asynchronously perform a query
+        See query_items()
+        :return: List of json objects
+        :rtype: List
+        """
+        return await self._run_async(
+            lambda: list(self.query_items(selection, alias=alias, project=project, where=where, options=options,
+                                          partition_key=partition_key, parameters=parameters)))
+
+    async def adelete_items(self, partition_key, where=None):
+        """
+        Asynchronously delete an item(s) from the database
+        See delete_items()
+        :param partition_key: value of partition path for container
+        :param where:
+        :return: list of ids of deleted items
+        """
+        return await self._run_async(self.delete_items, partition_key, where=where)
+
+    @staticmethod
+    async def _run_async(func, *args, **kwargs):
+        """
+        Run a blocking client operation in the event loop's default executor
+        The azure.cosmos.aio client isn't used, as it requires the optional aiohttp dependency, and would be a separate
+        client, with its own connection pool and metadata caches, which must be created and closed within an event loop.
+        Instead operations are run in worker threads sharing the pooled synchronous client, so the same client and the
+        same batching and fallback logic serve both the blocking and asynchronous methods.
+        :param func: function to run
+        :return: result of function
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(func, *args, **kwargs))
+
     def __setitem__(self, key, value):
         """
         Implement assignment to self[key]
         :param key: object property name
         :param value: value to assign
         """
-        if key not in CosmosDb.KEYS:
+        if key not in CosmosDb._KEYS_SET:
             raise ValueError(f'The key "{key}" is not valid')
-        self.__dict__[key] = value
+        setattr(self, key, value)
 
     def __getitem__(self, key):
         """
         Implement evaluation of self[key]
         :param key: object property name
         """
-        if key not in CosmosDb.KEYS:
+        if key not in CosmosDb._KEYS_SET:
             raise ValueError(f'The key "{key}" is not valid')
-        return self.__dict__[key]
+        return getattr(self, key)
 
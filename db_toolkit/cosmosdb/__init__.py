@@ -21,6 +21,9 @@
 
 from .CosmosDb import CosmosDb
 from .cosmosdb_sql import select
+from .cosmosdb_sql import select_template
+from .cosmosdb_sql import select_parameterised
+from .cosmosdb_sql import selection_key
 from .cosmosdb_sql import property_quote_if
 
 # if somebody does "from db_toolkit.cosmosdb import *", this is what they will
@@ -28,5 +31,8 @@ from .cosmosdb_sql import property_quote_if
 __all__ = [
     'CosmosDb',
     'select',
+    'select_template',
+    'select_parameterised',
+    'selection_key',
     'property_quote_if',
 ]
@@ -19,9 +19,13 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+from functools import lru_cache
+
 ALIAS = 'f'     # default alias to use in statements
+PARAM_PREFIX = '@p'     # prefix of query parameter names generated by select_template()
 
 
+@lru_cache(maxsize=1024)
 def property_quote_if(alias, name):
     """
     Make a property reference, escaping it if necessary
@@ -30,13 +34,9 @@ def property_quote_if(alias, name):
     :return: property reference
     :rtype: str
     """
-    if ' ' in name:
-        # This syntax is useful to escape a property that contains spaces, special characters, or has the same name as a
-        # SQL keyword or reserved word.
-        prop = f'["{name}"]'
-    else:
-        prop = f'.{name}'
-    return f'{alias}{prop}'
+    # The ["name"] syntax is useful to escape a property that contains spaces, special characters, or has the same
+    # name as a SQL keyword or reserved word.
+    return f'{alias}["{name}"]' if ' ' in name else f'{alias}.{name}'
 
 
 def select(container_name, selection, alias=ALIAS, project=None, where=None):
@@ -45,7 +45,7 @@ def select(container_name, selection, alias=ALIAS, project=None, where=None):
     :param container_name: Name of container
     :param selection: entries to select; may be
             - string, e.g. '*'
-            - list, e.g. ['id', 'name']
+            - list or tuple, e.g. ['id', 'name']
             - dict, e.g. {
     :param alias:
     :param project:
@@ -53,57 +53,175 @@ def select(container_name, selection, alias=ALIAS, project=None, where=None):
     :return: SQL string
     :rtype: str
     """
-    sql = 'SELECT '
-    if isinstance(selection, dict):
-        # SELECT {"Name":f.id, "City":f.address.city} AS Family
-        #     FROM Families f
-        #     WHERE f.address.city = f.address.state
-        if project is not None:
-            sql += '{'
+    if where is None and selection == '*':
+        # most common query, nothing to cache
+        return f'SELECT * FROM {container_name} {alias}'
+    try:
+        # the value types are part of the key, as values which compare equal may render differently, e.g. 1 and True
+        return _select_cached(container_name, selection_key(selection), alias, project,
+                              tuple((key, type(value), value) for key, value in where.items()) if where else None)
+    except TypeError:
+        # unhashable selection or where values, so can't be cached
+        return _build_select(container_name, selection, alias, project, where)
+
+
+@lru_cache(maxsize=1024)
+def _select_cached(container_name, selection, alias, project, where):
+    """
+    Generate a cosmosDb SQL select statement, caching the result
+    :param container_name: Name of container
+    :param selection: selection key, as returned by selection_key()
+    :param alias:
+    :param project:
+    :param where: tuple of (property, value type, value) tuples
+    :return: SQL string
+    :rtype: str
+    """
+    return _build_select(container_name, _selection_from_key(selection), alias, project,
+                         {key: value for key, _, value in where} if where else None)
+
+
+def _select_dict(selection, alias, project):
+    """
+    Generate the columns of a select statement for a dict selection
+    :param selection: dict of names and properties to select
+    :param alias:
+    :param project:
+    :return: columns
+    :rtype: str
+    """
+    # SELECT {"Name":f.id, "City":f.address.city} AS Family
+    #     FROM Families f
+    #     WHERE f.address.city = f.address.state
+    quote = property_quote_if
+    columns = ', '.join([f'"{key}":{quote(alias, value)}' for key, value in selection.items()])
+    if project is not None:
+        columns = f'{{{columns}}} AS {project}'
+    return columns
 
-        count = len(selection) - 1
-        for key in selection.keys():
-            sql += f'"{key}":{property_quote_if(alias, selection[key])}'
-            if count > 0:
-                sql += ', '
-            count -= 1
 
-        if project is not None:
-            sql += '} '
+def _select_list(selection, alias, project):
+    """
+    Generate the columns of a select statement for a list or tuple selection
+    :param selection: list of properties to select
+    :param alias:
+    :param project: ignored
+    :return: columns
+    :rtype: str
+    """
+    # SELECT f.id, f.address.city
+    #     FROM Families f
+    #     WHERE f.address.city = f.address.state
+    quote = property_quote_if
+    return ', '.join([quote(alias, value) for value in selection])
 
-        if project is not None:
-            sql += f'AS {project} '
 
-    elif isinstance(selection, list):
-        # SELECT f.id, f.address.city
-        #     FROM Families f
-        #     WHERE f.address.city = f.address.state
-        count = len(selection) - 1
-        for value in selection:
-            sql += f'{property_quote_if(alias, value)}'
-            if count > 0:
-                sql += ', '
-            count -= 1
-
-        sql += ' '
+# column generators by type of selection; any other selection is used as is, e.g. '*'
+_SELECTION_HANDLERS = {
+    dict: _select_dict,
+    list: _select_list,
+    tuple: _select_list,
+}
 
-    else:
-        sql += f'{selection} '
 
-    sql += f'FROM {container_name} {alias} '
+def _build_select(container_name, selection, alias, project, where):
+    """
+    Generate a cosmosDb SQL select statement
+    See select()
+    :return: SQL string
+    :rtype: str
+    """
+    handler = _SELECTION_HANDLERS.get(type(selection))
+    columns = handler(selection, alias, project) if handler is not None else selection
 
-    if where is not None:
+    if where:
         # TODO implement wheres other than =
-        sql += f'WHERE '
-        count = len(where) - 1
-        for key in where.keys():
-            sql += f'{property_quote_if(alias, key)} = {where[key]}'
-            if count > 0:
-                sql += ','
-            count -= 1
+        quote = property_quote_if
+        conditions = ' AND '.join([f'{quote(alias, key)} = {value}' for key, value in where.items()])
+        sql = f'SELECT {columns} FROM {container_name} {alias} WHERE {conditions}'
+    else:
+        sql = f'SELECT {columns} FROM {container_name} {alias}'
+
+    return sql
+
+
+def selection_key(selection):
+    """
+    Make a hashable key for a selection, for use with select_template()
+    :param selection: entries to select; see select()
+    :return: selection key
+    :rtype: tuple
+    """
+    if isinstance(selection, dict):
+        key = (dict, tuple(selection.items()))
+    elif isinstance(selection, list):
+        key = (list, tuple(selection))
+    else:
+        key = (str, selection)
+    return key
 
-    return sql.strip()
 
+def _selection_from_key(key):
+    """
+    Recreate a selection from its key
+    :param key: selection key, as returned by selection_key()
+    :return: selection
+    """
+    kind, entries = key
+    if kind is dict:
+        entries = dict(entries)
+    elif kind is list:
+        entries = list(entries)
+    return entries
 
 
+@lru_cache(maxsize=256)
+def select_template(container_name, selection, alias=ALIAS, project=None, where_keys=None):
+    """
+    Generate a parameterised cosmosDb SQL select statement
+    The where values are supplied as query parameters, so the same statement may be reused for any values.
+    :param container_name: Name of container
+    :param selection: selection key, as returned by selection_key()
+    :param alias:
+    :param project:
+    :param where_keys: tuple of properties which must equal the corresponding query parameter values
+    :return: tuple of SQL string and tuple of parameter names, in where_keys order
+    :rtype: tuple
+    """
+    return _build_select_template(container_name, _selection_from_key(selection), alias, project, where_keys)
+
+
+def select_parameterised(container_name, selection, alias=ALIAS, project=None, where_keys=None):
+    """
+    Generate a parameterised cosmosDb SQL select statement, using the cached statement if possible
+    See select_template()
+    :param container_name: Name of container
+    :param selection: entries to select; see select()
+    :param alias:
+    :param project:
+    :param where_keys: tuple of properties which must equal the corresponding query parameter values
+    :return: tuple of SQL string and tuple of parameter names, in where_keys order
+    :rtype: tuple
+    """
+    try:
+        return select_template(container_name, selection_key(selection), alias=alias, project=project,
+                               where_keys=where_keys)
+    except TypeError:
+        # unhashable selection, so can't be cached
+        return _build_select_template(container_name, selection, alias, project, where_keys)
+
+
+def _build_select_template(container_name, selection, alias, project, where_keys):
+    """
+    Generate a parameterised cosmosDb SQL select statement
+    See select_parameterised()
+    :return: tuple of SQL string and tuple of parameter names, in where_keys order
+    :rtype: tuple
+    """
+    where = None
+    param_names = ()
+    if where_keys is not None:
+        param_names = tuple(f'{PARAM_PREFIX}{index}' for index in range(len(where_keys)))
+        where = dict(zip(where_keys, param_names))
 
+    return _build_select(container_name, selection, alias, project, where), param_names
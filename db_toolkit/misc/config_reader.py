@@ -22,15 +22,21 @@
 from io import SEEK_SET
 from os import (
     path,
-    getcwd
+    getcwd,
+    stat
 )
 from decimal import Decimal
-import re
 import logging
 import yaml
 import pkg_resources
 from .get_env import test_file_path
 
+COMMENT_PREFIXES = ('#', ';')    # prefixes of comment lines in configuration files
+CFG_BUFFER_SIZE = 64 * 1024     # default buffer size used when reading configuration files
+
+# parsed configuration files, by (absolute path, keys, separator), with the modification time and size when parsed
+_CFG_CACHE = {}
+
 
 def load_cfg_file(cfg_file, keys, separator='='):
     """
@@ -45,44 +51,58 @@ def load_cfg_file(cfg_file, keys, separator='='):
     if cfg_file is None:
         raise ValueError('Missing configuration file argument')
 
-    config = {}
     cfg_file.seek(0, SEEK_SET)  # seek start of file
-    count = 0
-    for line in cfg_file:
-        line = line.strip()
-        count += 1
+    return _parse_cfg_lines(cfg_file, keys, separator)
+
+
+def _parse_cfg_lines(lines, keys, separator):
+    """
+    Parse configuration file lines
+    :param lines: iterable of configuration file lines
+    :param keys: List of keys for which to retrieve values
+    :param separator: key/value separator
+    :return: dict of key/values
+    :rtype: dict
+    :raises ValueError when invalid configuration entries detected
+    """
+    config = {}
+    log_unknown = logging.getLogger().isEnabledFor(logging.INFO)
+    for count, line in enumerate(lines, 1):
+        # the key and value are stripped after splitting, so only leading whitespace needs removing here
+        line = line.lstrip()
 
         # skip blank or commented lines
-        if len(line) == 0:
-            continue
-        if line.startswith('#'):
+        if not line or line.startswith(COMMENT_PREFIXES):
             continue
 
-        key_val = re.match(rf'(\w+)\s*{separator}(.*)', line)
-        if not key_val:
-            raise ValueError(f'Invalid configuration file entry on line {count}: {line}')
+        key, sep, value = line.partition(separator)
+        if not sep:
+            raise ValueError(f'Invalid configuration file entry on line {count}: {line.rstrip()}')
 
-        key = key_val.groups()[0].lower().strip()
-        if len(key) == 0:
-            raise ValueError(f'Missing key entry on line {count}: {line}')
-        value = key_val.groups()[1].strip()
-        if len(value) == 0:
-            raise ValueError(f'Missing value entry on line {count}: {line}')
+        key = key.rstrip().lower()
+        if not key:
+            raise ValueError(f'Missing key entry on line {count}: {line.rstrip()}')
+        if not key.replace('_', '').isalnum():
+            raise ValueError(f'Invalid configuration file entry on line {count}: {line.rstrip()}')
+        value = value.strip()
+        if not value:
+            raise ValueError(f'Missing value entry on line {count}: {line.rstrip()}')
 
         if key in keys:
             config[key] = value
-        else:
+        elif log_unknown:
             logging.info(f'Ignoring unknown entry on line {count}')
 
     return config
 
 
-def load_cfg_filename(cfg_filename, keys, separator='='):
+def load_cfg_filename(cfg_filename, keys, separator='=', buffering=CFG_BUFFER_SIZE):
     """
     Read settings from specified configuration file
     :param cfg_filename: Path of configuration file to load
     :param keys: List of keys for which to retrieve values
     :param separator: Optional key/value separator,defaults to '='
+    :param buffering: Optional read buffer size, defaults to CFG_BUFFER_SIZE
     :return: dict of key/values
     :rtype: dict
     :raises ValueError when invalid configuration entries detected
@@ -95,10 +115,19 @@ def load_cfg_filename(cfg_filename, keys, separator='='):
         raise ValueError(f'Configuration file does not exist: {cfg_filename}\n'
                          f'  Current working directory: {getcwd()}')
 
-    with open(cfg_filename, 'r') as cfg_file:
-        config = load_cfg_file(cfg_file, keys, separator=separator)
-
-    return config
+    # the same file is typically loaded by multiple objects, so reuse the parsed result until the file is modified
+    cache_key = (path.abspath(cfg_filename), tuple(keys), separator)
+    cfg_stat = stat(cfg_filename)
+    version = (cfg_stat.st_mtime_ns, cfg_stat.st_size)
+    cached = _CFG_CACHE.get(cache_key)
+    if cached is not None and cached[0] == version:
+        config = cached[1]
+    else:
+        with open(cfg_filename, 'r', buffering=buffering) as cfg_file:
+            config = _parse_cfg_lines(cfg_file, keys, separator)
+        _CFG_CACHE[cache_key] = (version, config)
+
+    return config.copy()    # copy, so callers can't modify the cached configuration
 
 
 def load_yaml(yaml_path, key=None):
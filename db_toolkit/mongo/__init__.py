@@ -20,9 +20,11 @@
 # SOFTWARE.
 
 from .MongoDb import MongoDb
+from .MongoDb import shutdown_pool
 
 # if somebody does "from db_toolkit.mongo import *", this is what they will
 # be able to access:
 __all__ = [
     'MongoDb',
+    'shutdown_pool',
 ]
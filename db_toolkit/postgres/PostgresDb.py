@@ -20,14 +20,94 @@
 # SOFTWARE.
 
 import logging
+import threading
+import weakref
+
 import psycopg2
+from psycopg2.pool import (
+    PoolError,
+    ThreadedConnectionPool
+)
 
 from db_toolkit.misc.config_reader import load_cfg_file
 from db_toolkit.misc.config_reader import load_cfg_filename
+from db_toolkit.misc.config_reader import CFG_BUFFER_SIZE
 
 
 # http://initd.org/psycopg/docs/connection.html
 
+POOL_MAXCONN = 10   # default maximum number of connections in a connection pool
+
+class _ConnectionPool(ThreadedConnectionPool):
+    """
+    Thread-safe connection pool which opens connections on demand, and keeps up to maxconn returned connections open
+    for reuse
+    """
+
+    def __init__(self, maxconn, *args, **kwargs):
+        """
+        Initialise object
+        :param maxconn: maximum number of connections in the pool
+        :param args: connection arguments
+        :param kwargs: connection keyword arguments
+        """
+        # no connections are opened on creation, as minconn connections are opened by the constructor
+        super().__init__(0, maxconn, *args, **kwargs)
+        # a returned connection is only kept open while fewer than minconn connections are idle
+        self.minconn = maxconn
+
+
+# connection pools by connection parameters, shared between all objects using the same database
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def _get_pool(user, password, host, port, dbname, maxconn=POOL_MAXCONN):
+    """
+    Get the shared connection pool for the specified connection parameters, creating it if necessary
+    :param user: user name used to authenticate
+    :param password: password used to authenticate
+    :param host: database host address
+    :param port: connection port number
+    :param dbname: the database name
+    :param maxconn: maximum number of connections in the pool, if created
+    :return: connection pool
+    :rtype: _ConnectionPool
+    """
+    key = (user, password, host, port, dbname)
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            # http://initd.org/psycopg/docs/pool.html
+            pool = _ConnectionPool(maxconn, user=user, password=password, host=host, port=port, dbname=dbname)
+            _POOLS[key] = pool
+    return pool
+
+
+def _return_connection(pool, connection):
+    """
+    Return a connection to the pool it was taken from, or close it if the pool has been shut down
+    :param pool: pool connection was taken from
+    :param connection: connection to return
+    """
+    try:
+        pool.putconn(connection)
+    except PoolError:
+        # pool has been shut down
+        connection.close()
+
+
+def shutdown_pool():
+    """
+    Close all the connections in all the shared connection pools
+    Intended for process teardown, as PostgresDb.close_connection() returns an object's connection to its pool.
+    """
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.closeall()
+
 
 class PostgresDb:
     """
@@ -44,9 +124,18 @@ class PostgresDb:
                  # provided)
         'port'  # connection port number (defaults to 5432 if not provided)
     )
+    _KEYS_SET = frozenset(KEYS)
+    CFG_BUFFER_SIZE = CFG_BUFFER_SIZE   # read buffer size for configuration files, may be overridden
+
+    __slots__ = KEYS + (
+        'connection',
+        'pool_maxconn',
+        '_release',
+        '__weakref__',
+    )
 
     def __init__(self, cfg_filename=None, cfg_dict=None,
-                 user=None, password=None, dbname=None, host=None, port=None):
+                 user=None, password=None, dbname=None, host=None, port=None, pool_maxconn=POOL_MAXCONN):
         """
         Initialise object
         :param cfg_filename: Path of configuration file
@@ -57,6 +146,7 @@ class PostgresDb:
         :param host: database host address (defaults to UNIX socket if not
                      provided)
         :param port: connection port number (defaults to 5432 if not provided)
+        :param pool_maxconn: maximum number of connections in the connection pool, if created; default POOL_MAXCONN
         """
         self.user = user
         self.password = password
@@ -64,23 +154,26 @@ class PostgresDb:
         self.host = host
         self.port = port
         self.connection = None
+        self.pool_maxconn = pool_maxconn
+        self._release = None    # finalizer which returns the connection to its pool
         if cfg_filename is not None:
             self._load_cfg_filename(cfg_filename)
         elif cfg_dict is not None:
             self.__set_config(cfg_dict)
 
-        for key in PostgresDb.REQUIRED_KEYS:
-            if self[key] is None:
-                raise ValueError(f'Missing {key} configuration')
+        # check for missing required keys
+        missing = [key for key in PostgresDb.REQUIRED_KEYS if getattr(self, key) is None]
+        if len(missing) > 0:
+            raise ValueError(f'Missing {missing[0]} configuration')
 
     def __set_config(self, config):
         """
         Set the configuration
         :param config: dict with settings
         """
-        for key in config.keys():
-            if key in PostgresDb.KEYS:
-                self[key] = config[key]
+        # only known keys are set, so no need to re-validate each one via __setitem__
+        for key in PostgresDb._KEYS_SET.intersection(config):
+            setattr(self, key, config[key])
 
     def _load_cfg_file(self, cfg_file):
         """
@@ -94,28 +187,33 @@ class PostgresDb:
         Read settings from specified configuration file
         :param cfg_filename: Path of configuration file to load
         """
-        self.__set_config(load_cfg_filename(cfg_filename, PostgresDb.KEYS))
+        self.__set_config(load_cfg_filename(cfg_filename, PostgresDb.KEYS, buffering=self.CFG_BUFFER_SIZE))
 
     def get_connection(self):
         """
         Establish a connection to the database, or return the existing connection
         :return: database connection
+        :raises PoolError: if all the connections in the shared connection pool are in use
         """
         if not self.is_connected():
             try:
-                self.connection = psycopg2.connect(
-                    user=self.user,
-                    password=self.password,
-                    host=self.host,
-                    port=self.port,
-                    dbname=self.dbname)
+                pool = _get_pool(self.user, self.password, self.host, self.port, self.dbname,
+                                 maxconn=self.pool_maxconn)
+                self.connection = pool.getconn()
+                # the connection is returned to the pool when this object is garbage collected, if not closed before
+                self._release = weakref.finalize(self, _return_connection, pool, self.connection)
 
                 # log PostgreSQL Connection properties
                 logging.info(self.connection.get_dsn_parameters())
 
+            except PoolError as pool_error:
+                self.connection = None
+                raise PoolError(f'Unable to get a connection for {self.user}@{self.host}/{self.dbname} from the shared '
+                                f'connection pool, which allows {pool.maxconn} connections: {pool_error}. '
+                                f'Release unused connections with close_connection()') from pool_error
             except (Exception, psycopg2.Error) as dbError:
                 logging.warning(dbError)
-                self.connection = None
+                self.close_connection()
 
         return self.connection
 
@@ -129,10 +227,12 @@ class PostgresDb:
     def close_connection(self):
         """
         Close connection
+        The connection is returned to the shared connection pool; see shutdown_pool()
         """
         if self.is_connected():
-            self.connection.close()
+            self._release()
             self.connection = None
+            self._release = None
 
     def cursor(self):
         """
@@ -164,10 +264,7 @@ class PostgresDb:
         :return: configuration
         :rtype: dict
         """
-        # new dict excluding non-config properties of object
-        dict_copy = {key: self.__dict__[key]
-                     for key in self.__dict__.keys() if key in PostgresDb.KEYS}
-        return dict_copy
+        return {key: getattr(self, key) for key in PostgresDb.KEYS}
 
     def __setitem__(self, key, value):
         """
@@ -175,15 +272,15 @@ class PostgresDb:
         :param key: object property name
         :param value: value to assign
         """
-        if key not in PostgresDb.KEYS:
+        if key not in PostgresDb._KEYS_SET:
             raise ValueError(f'The key "{key}" is not valid')
-        self.__dict__[key] = value
+        setattr(self, key, value)
 
     def __getitem__(self, key):
         """
         Implement evaluation of self[key]
         :param key: object property name
         """
-        if key not in PostgresDb.KEYS:
+        if key not in PostgresDb._KEYS_SET:
             raise ValueError(f'The key "{key}" is not valid')
-        return self.__dict__[key]
+        return getattr(self, key)
@@ -20,10 +20,12 @@
 # SOFTWARE.
 
 from .PostgresDb import PostgresDb
+from .PostgresDb import shutdown_pool
 from .postgresdb_sql import (
     does_table_exist_sql,
     count_sql,
     estimate_count_sql,
+    fast_count_sql,
     drop_table_sql,
 )
 
@@ -31,8 +33,10 @@ from .postgresdb_sql import (
 # be able to access:
 __all__ = [
     'PostgresDb',
+    'shutdown_pool',
     'does_table_exist_sql',
     'count_sql',
     'estimate_count_sql',
+    'fast_count_sql',
     'drop_table_sql',
 ]
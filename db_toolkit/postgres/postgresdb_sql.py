@@ -20,23 +20,38 @@
 # SOFTWARE.
 
 
+from psycopg2 import sql
+
+# statement templates; the table name is composed in as a quoted identifier or literal, so the results may be passed
+# straight to cursor.execute()
+_TABLE_EXISTS = sql.SQL('SELECT EXISTS (SELECT 1 FROM INFORMATION_SCHEMA.TABLES WHERE TABLES.TABLE_NAME={name});')
+_COUNT = sql.SQL('SELECT COUNT(*) FROM {table};')
+_ESTIMATE_COUNT = sql.SQL('SELECT reltuples::BIGINT AS estimate FROM pg_class WHERE relname={name};')
+# from PostgreSQL 14, reltuples is -1 if the table has never been vacuumed or analysed
+_FAST_COUNT = sql.SQL('SELECT CASE WHEN reltuples < 0 THEN (SELECT COUNT(*) FROM {table}) ELSE reltuples::BIGINT END '
+                      'AS count FROM pg_class WHERE relname={name};')
+_DROP_TABLE = sql.SQL('DROP TABLE IF EXISTS {table} CASCADE;')
+
+
 def does_table_exist_sql(name):
     """
     Generate SQL to check if a table exists
     See https://www.dbrnd.com/2017/07/postgresql-different-options-to-check-if-table-exists-in-database-to_regclass/
     :param name: table name
-    :return: SQL string
+    :return: SQL statement
+    :rtype: psycopg2.sql.Composed
     """
-    return f"SELECT EXISTS (SELECT 1 FROM INFORMATION_SCHEMA.TABLES WHERE TABLES.TABLE_NAME='{name}');"
+    return _TABLE_EXISTS.format(name=sql.Literal(name))
 
 
 def count_sql(name):
     """
     Generate SQL to count the number of rows in a table
     :param name: table name
-    :return: SQL string
+    :return: SQL statement
+    :rtype: psycopg2.sql.Composed
     """
-    return f'SELECT COUNT(*) FROM "{name}";'
+    return _COUNT.format(table=sql.Identifier(name))
 
 
 def estimate_count_sql(name):
@@ -44,15 +59,31 @@ def estimate_count_sql(name):
     Generate SQL to estimate the number of rows in a table
     See https://wiki.postgresql.org/wiki/Count_estimate
     :param name: table name
-    :return: SQL string
+    :return: SQL statement
+    :rtype: psycopg2.sql.Composed
+    """
+    return _ESTIMATE_COUNT.format(name=sql.Literal(name))
+
+
+def fast_count_sql(name):
+    """
+    Generate SQL to get the number of rows in a table, using the planner estimate if the table has been analysed,
+    otherwise counting the rows
+    See https://wiki.postgresql.org/wiki/Count_estimate
+    :param name: table name
+    :return: SQL statement
+    :rtype: psycopg2.sql.Composed
     """
-    return f"SELECT reltuples::BIGINT AS estimate FROM pg_class WHERE relname='{name}';"
+    return _FAST_COUNT.format(table=sql.Identifier(name), name=sql.Literal(name))
 
 
 def drop_table_sql(name):
     """
     Generate SQL to drop a table
+    The name is treated as an unquoted name, so may be schema-qualified, e.g. 'myschema.mytable', and is folded to
+    lower case, as PostgreSQL does for unquoted names.
     :param name: table name
-    :return: SQL string
+    :return: SQL statement; use as_string(connection) to get the SQL string
+    :rtype: psycopg2.sql.Composed
     """
-    return f"DROP TABLE IF EXISTS {name} CASCADE;"
+    return _DROP_TABLE.format(table=sql.Identifier(*name.lower().split('.')))
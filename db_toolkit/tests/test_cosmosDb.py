@@ -19,10 +19,12 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import asyncio
+import threading
 import unittest
 from unittest import TestCase
+from unittest.mock import patch
 from io import StringIO
-from io import SEEK_SET
 from cosmosdb.CosmosDb import CosmosDb
 from testfixtures import LogCapture
 
@@ -50,11 +52,8 @@ class TestCosmosDb(TestCase):
                     self.assertRaises(ValueError, CosmosDb, endpoint=end, key=quay)
 
         # valid config file
-        str_io = StringIO()
-        str_io.write(' # this is a comment\n')
-        for idx in list(range(len(CosmosDb.KEYS))):
-            str_io.write(f'{CosmosDb.KEYS[idx]}= {values[idx]}\n')
-        str_io.seek(0, SEEK_SET)
+        text = ' # this is a comment\n; so is this\n' + \
+            ''.join([f'{key}= {value}\n' for key, value in zip(CosmosDb.KEYS, values)])
 
         # test object
         db = CosmosDb(endpoint='fake endpoint', key='fake key', test=True)
@@ -63,45 +62,91 @@ class TestCosmosDb(TestCase):
         self.assertRaises(ValueError, db._load_cfg_file, None)
 
         # test valid config file handle
-        db._load_cfg_file(str_io)
-        for idx in list(range(len(CosmosDb.KEYS))):
-            self.assertEqual(db[CosmosDb.KEYS[idx]], values[idx])
+        db._load_cfg_file(StringIO(text))
+        for idx, key in enumerate(CosmosDb.KEYS):
+            self.assertEqual(db[key], values[idx])
 
         # test missing value
-        str_io.truncate(0)
-        str_io.seek(0, SEEK_SET)
-        str_io.write(f'endpoint= \n')
-        self.assertRaises(ValueError, db._load_cfg_file, str_io)
+        self.assertRaises(ValueError, db._load_cfg_file, StringIO('endpoint= \n'))
 
         # test missing key
-        str_io.truncate(0)
-        str_io.seek(0, SEEK_SET)
-        str_io.write(f'= value\n')
-        self.assertRaises(ValueError, db._load_cfg_file, str_io)
+        self.assertRaises(ValueError, db._load_cfg_file, StringIO('= value\n'))
 
         # invalid separator
-        str_io.truncate(0)
-        str_io.seek(0, SEEK_SET)
-        str_io.write(f'endpoint: value\n')
-        self.assertRaises(ValueError, db._load_cfg_file, str_io)
+        self.assertRaises(ValueError, db._load_cfg_file, StringIO('endpoint: value\n'))
 
         # unknown key/value
-        str_io.truncate(0)
-        str_io.seek(0, SEEK_SET)
-        str_io.write(f'unknown_key= value\n')
         with LogCapture() as log_cap:
-            db._load_cfg_file(str_io)
+            db._load_cfg_file(StringIO('unknown_key= value\n'))
             log_cap.check(
                 ('root', 'INFO', 'Ignoring unknown entry on line 1'),
             )
 
-        str_io.close()
-
         # test invalid config file path
         self.assertRaises(ValueError, CosmosDb, cfg_filename='doesnotexist')
         # test invalid config file argument type
         self.assertRaises(ValueError, CosmosDb, cfg_filename=['i am a list'])
 
+    def test_make_doc_link(self):
+        db = CosmosDb(endpoint='fake endpoint', key='fake key', dbname='mydb', container_name='mycontainer', test=True)
+        self.assertEqual('dbs/mydb/colls/mycontainer/docs/mydoc', db.make_doc_link('mydoc'))
+        # ids needn't be strings
+        self.assertEqual('dbs/mydb/colls/mycontainer/docs/1', db.make_doc_link(1))
+        self.assertEqual('dbs/other/colls/mycontainer/docs/1', db.make_doc_link(1, dbname='other'))
+
+    def test_query_items_unhashable_selection(self):
+        """
+        Tests that parameterised queries with an unhashable selection, which can't be cached, are still generated
+        """
+        class Selection:
+            # defining __eq__ without __hash__ makes instances unhashable
+            def __eq__(self, other):
+                return isinstance(other, Selection)
+
+            def __str__(self):
+                return 'f.id'
+
+        db = CosmosDb(endpoint='fake endpoint', key='fake key', container_name='Families', test=True)
+        with patch.object(CosmosDb, 'query_items_sql', return_value=iter(())) as query_items_sql:
+            db.query_items(Selection(), parameters={'id': 'AndersenFamily'})
+        self.assertEqual((('SELECT f.id FROM Families f WHERE f.id = @p0',),
+                          {'options': None, 'partition_key': None,
+                           'parameters': [{'name': '@p0', 'value': 'AndersenFamily'}]}),
+                         tuple(query_items_sql.call_args))
+
+    def test_async(self):
+        """
+        Tests that the asynchronous methods run the blocking methods in worker threads
+        """
+        db = CosmosDb(endpoint='fake endpoint', key='fake key', test=True)
+        threads = []
+
+        def blocking(result):
+            def run(*args, **kwargs):
+                threads.append(threading.get_ident())
+                return result
+            return run
+
+        cases = [
+            ('upsert_item', blocking({'id': '1'}), lambda: db.aupsert_item({'id': '1'}),
+             {'id': '1'}, (({'id': '1'},), {})),
+            ('query_items_sql', blocking(iter([{'id': '1'}])), lambda: db.aquery_items_sql('SELECT * FROM c'),
+             [{'id': '1'}], (('SELECT * FROM c',), {'options': None, 'partition_key': None, 'parameters': None})),
+            ('query_items', blocking(iter([{'id': '1'}])), lambda: db.aquery_items('*', where={'id': '"1"'}),
+             [{'id': '1'}], (('*',), {'alias': 'f', 'project': None, 'where': {'id': '"1"'}, 'options': None,
+                                      'partition_key': None, 'parameters': None})),
+            ('delete_items', blocking(['1']), lambda: db.adelete_items('pk', where={'id': '"1"'}),
+             ['1'], (('pk',), {'where': {'id': '"1"'}})),
+        ]
+        for name, side_effect, coroutine, expected, call_args in cases:
+            with self.subTest(method=name):
+                threads.clear()
+                with patch.object(CosmosDb, name, side_effect=side_effect) as blocking_method:
+                    self.assertEqual(expected, asyncio.run(coroutine()))
+                self.assertEqual(call_args, tuple(blocking_method.call_args))
+                self.assertEqual(1, len(threads))
+                self.assertNotEqual(threading.get_ident(), threads[0])
+
 
 if __name__ == '__main__':
     unittest.main()
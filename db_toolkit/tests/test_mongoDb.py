@@ -21,16 +21,24 @@
 
 import unittest
 from unittest import TestCase
-from mongo.MongoDb import MongoDb
-from io import (
-    StringIO,
-    SEEK_SET
+from mongo.MongoDb import (
+    MongoDb,
+    shutdown_pool
 )
-from testfixtures import (
-    LogCapture,
-    StringComparison
+from io import StringIO
+from testfixtures import LogCapture
+from pymongo.errors import (
+    BulkWriteError,
+    OperationFailure
+)
+from pymongo.results import InsertManyResult
+from unittest.mock import (
+    MagicMock,
+    patch
 )
 import os
+import sys
+from itertools import product
 
 # indices of argument keys in MongoDb.KEYS
 server_idx = 0
@@ -63,6 +71,44 @@ values = (
     'false'
 )
 
+# MongoDb module, as the package exports the class under the same name
+mongo_db_module = sys.modules[MongoDb.__module__]
+
+AZURE_SERVER = 'myserver.mongo.cosmos.azure.com'
+TOO_MANY_REQUESTS = 16500   # Azure Cosmos DB error code when the throughput is exceeded
+
+
+class FakeCollection:
+    """
+    Collection which records inserted documents, and raises a BulkWriteError for specified insert requests
+    """
+
+    def __init__(self, errors=None, code=TOO_MANY_REQUESTS):
+        """
+        Initialise object
+        :param errors: dict of insert request number (from 0) and index of the document which fails in the request
+        :param code: error code of write errors
+        """
+        self.errors = errors if errors is not None else {}
+        self.code = code
+        self.requests = []      # documents in each insert request
+        self.inserted = []      # documents inserted
+
+    def insert_many(self, documents):
+        documents = list(documents)
+        request = len(self.requests)
+        self.requests.append(documents)
+        if request in self.errors:
+            index = self.errors[request]
+            self.inserted.extend(documents[:index])
+            raise BulkWriteError({'writeErrors': [{'index': index, 'code': self.code, 'errmsg': 'failed'}]})
+        self.inserted.extend(documents)
+        return InsertManyResult([document['_id'] for document in documents], True)
+
+
+def make_documents(count):
+    return [{'_id': idx} for idx in range(count)]
+
 
 class TestMongoDb(TestCase):
     """
@@ -75,28 +121,20 @@ class TestMongoDb(TestCase):
 
         # check less than min constructor arguments
         self.assertRaises(ValueError, MongoDb)
-        for svr in [None, values[server_idx]]:
-            for usr in [None, values[user_idx]]:
-                for passwd in [None, values[password_idx]]:
-                    for port in [None, values[port_idx]]:
-                        for db in [None, values[dbname_idx]]:
-                            for auth in [None, values[auth_src_idx]]:
-                                for coll in [None, values[collection_idx]]:
-                                    if svr is None:
-                                        self.assertRaises(ValueError, MongoDb, server=svr, username=usr,
-                                                          password=passwd, port=port, dbname=db, auth_source=auth,
-                                                          collection=coll, test=True)
-                                    else:
-                                        obj = MongoDb(server=svr, username=usr, password=passwd, port=port, dbname=db,
-                                                      auth_source=auth, collection=coll, test=True)
-                                        self.assertIsNotNone(obj)
+        server = values[server_idx]
+        options = [(None, values[idx])
+                   for idx in (user_idx, password_idx, port_idx, dbname_idx, auth_src_idx, collection_idx)]
+        for usr, passwd, port, db, auth, coll in product(*options):
+            # server is the only required argument
+            self.assertRaises(ValueError, MongoDb, server=None, username=usr, password=passwd, port=port,
+                              dbname=db, auth_source=auth, collection=coll, test=True)
+            obj = MongoDb(server=server, username=usr, password=passwd, port=port, dbname=db,
+                          auth_source=auth, collection=coll, test=True)
+            self.assertIsNotNone(obj)
 
         # valid config file
-        str_io = StringIO()
-        str_io.write(' # this is a comment\n')
-        for idx in list(range(len(MongoDb.KEYS))):
-            str_io.write(f'{MongoDb.KEYS[idx]}= {values[idx]}\n')
-        str_io.seek(0, SEEK_SET)
+        str_io = StringIO(' # this is a comment\n' +
+                          ''.join([f'{key}= {value}\n' for key, value in zip(MongoDb.KEYS, values)]))
 
         db = MongoDb(server='fake server', test=True)
 
@@ -105,90 +143,72 @@ class TestMongoDb(TestCase):
 
         # test valid config file handle
         db._load_cfg_file(str_io)
-        for idx in list(range(len(MongoDb.KEYS))):
-            self.assertEqual(db[MongoDb.KEYS[idx]], values[idx])
-
-        # valid invalid port & timeout
-        for test_key in ['port', 'max_idle_time_ms']:
-            str_io.truncate(0)
-            str_io.seek(0, SEEK_SET)
-            for idx in list(range(len(MongoDb.KEYS))):
-                if MongoDb.KEYS[idx] == test_key:
-                    str_io.write(f'{MongoDb.KEYS[idx]}= notaninteger\n')
-                else:
-                    str_io.write(f'{MongoDb.KEYS[idx]}= {values[idx]}\n')
-            db._load_cfg_file(str_io)
-            self.assertRaises(ValueError, db.make_db_link)
-
-            str_io.truncate(0)
-            str_io.seek(0, SEEK_SET)
-            for idx in list(range(len(MongoDb.KEYS))):
-                if MongoDb.KEYS[idx] == test_key:
-                    str_io.write(f'{MongoDb.KEYS[idx]}= {values[idx]}\n')
-                else:
-                    str_io.write(f'{MongoDb.KEYS[idx]}= 10.2\n')
-            db._load_cfg_file(str_io)
-            self.assertRaises(ValueError, db.make_db_link)
-
-        # valid invalid ssl
-        for test_key in ['ssl', 'retry_writes']:
-            str_io.truncate(0)
-            str_io.seek(0, SEEK_SET)
-            for idx in list(range(len(MongoDb.KEYS))):
-                if MongoDb.KEYS[idx] == test_key:
-                    str_io.write(f'{MongoDb.KEYS[idx]}= notaboolean\n')
-                else:
-                    str_io.write(f'{MongoDb.KEYS[idx]}= {values[idx]}\n')
-            db._load_cfg_file(str_io)
-            self.assertRaises(ValueError, db.make_db_link)
+        for idx, key in enumerate(MongoDb.KEYS):
+            self.assertEqual(db[key], values[idx])
+
+        # invalid integer & boolean values, each applied to an otherwise valid config file
+        template = dict(zip(MongoDb.KEYS, values))
+        bad_cases = [
+            ('port', 'notaninteger'),
+            ('port', '10.2'),
+            ('max_idle_time_ms', 'notaninteger'),
+            ('max_idle_time_ms', '10.2'),
+            ('ssl', 'notaboolean'),
+            ('retry_writes', 'notaboolean'),
+        ]
+        for test_key, bad_value in bad_cases:
+            with self.subTest(key=test_key, value=bad_value):
+                config = {**template, test_key: bad_value}
+                db._load_cfg_file(StringIO(''.join([f'{key}= {value}\n' for key, value in config.items()])))
+                self.assertRaises(ValueError, db.make_db_link)
 
         # test missing value
-        str_io.truncate(0)
-        str_io.seek(0, SEEK_SET)
-        str_io.write(f'username= \n')
-        self.assertRaises(ValueError, db._load_cfg_file, str_io)
+        self.assertRaises(ValueError, db._load_cfg_file, StringIO('username= \n'))
 
         # test missing key
-        str_io.truncate(0)
-        str_io.seek(0, SEEK_SET)
-        str_io.write(f'= value\n')
-        self.assertRaises(ValueError, db._load_cfg_file, str_io)
+        self.assertRaises(ValueError, db._load_cfg_file, StringIO('= value\n'))
 
         # invalid separator
-        str_io.truncate(0)
-        str_io.seek(0, SEEK_SET)
-        str_io.write(f'user: value\n')
-        self.assertRaises(ValueError, db._load_cfg_file, str_io)
+        self.assertRaises(ValueError, db._load_cfg_file, StringIO('user: value\n'))
 
         # unknown key/value
-        str_io.truncate(0)
-        str_io.seek(0, SEEK_SET)
-        str_io.write(f'unknown_key= value\n')
         with LogCapture() as log_cap:
-            db._load_cfg_file(str_io)
+            db._load_cfg_file(StringIO('unknown_key= value\n'))
             log_cap.check(
                 ('root', 'INFO', 'Ignoring unknown entry on line 1'),
             )
 
-        str_io.close()
-
         # test invalid config file path
         self.assertRaises(ValueError, MongoDb, cfg_filename='doesnotexist')
         # test invalid config file argument type
         self.assertRaises(ValueError, MongoDb, cfg_filename=['i am a list'])
 
+    @classmethod
+    def setUpClass(cls):
+        """
+        Create the test database object shared by the tests
+        Connections are pooled, so the tests may close and reopen connections without reconnecting to the server.
+        """
+        cfg_filename = os.environ.get('MONGO_CFG')
+        cls.test_db = MongoDb(cfg_filename=cfg_filename) if cfg_filename is not None else None
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.test_db is not None:
+            cls.test_db.close_connection()
+        shutdown_pool()
+
     def get_test_database(self):
         """
         Get the test database
         Note: a valid configuration file is required.
               Specify the path to the file in the environment variable MONGO_CFG.
         """
-        cfg_filename = os.environ.get('MONGO_CFG')
-        if cfg_filename is None:
+        if self.test_db is None:
             self.fail('Configuration file not set. '
                       'Please specify path to configuration file as environment variable MONGO_CFG')
 
-        return MongoDb(cfg_filename=cfg_filename)
+        return self.test_db
 
     def test_make_db_link(self):
         """
@@ -221,19 +241,22 @@ class TestMongoDb(TestCase):
         self.assertEqual(f'mongodb://{username}:{password}@{server}:{port}', link)
 
         # test query arguments
+        keys = MongoDb.KEYS
+        query_key_names = MongoDb.QUERY_KEY_NAME_BY_KEY
         expected = f'mongodb://{username}:{password}@{server}:{port}/?'
         for idx in range(auth_src_idx, app_name_idx + 1):
-            db[MongoDb.KEYS[idx]] = values[idx]
+            key = keys[idx]
+            value = values[idx]
+            db[key] = value
             if idx > auth_src_idx:
                 expected += f'&'
-            q_idx = MongoDb.QUERY_KEYS.index(MongoDb.KEYS[idx])
-            expected += f'{MongoDb.QUERY_KEY_NAMES[q_idx]}={values[idx]}'
+            expected += f'{query_key_names[key]}={value}'
             link = db.make_db_link()
             self.assertEqual(expected, link)
 
         # clear query args
-        for idx in range(auth_src_idx, app_name_idx + 1):
-            db[MongoDb.KEYS[idx]] = None
+        for key in keys[auth_src_idx:app_name_idx + 1]:
+            db[key] = None
 
         # test percent encoded username
         db.username = 'fun@ny:user/name%'
@@ -247,6 +270,21 @@ class TestMongoDb(TestCase):
         link = db.make_db_link()
         self.assertEqual(f'mongodb://{encoded_username}:{encoded_password}@{server}:{port}', link)
 
+    def test_make_db_link_value_types(self):
+        """
+        Run a unit test on db connection strings for values which compare equal to valid values, but aren't valid
+        """
+        server = values[server_idx]
+        for key, valid, invalid in [('ssl', True, 1), ('port', 1, True)]:
+            with self.subTest(key=key):
+                db = MongoDb(server=server, test=True, **{key: valid})
+                self.assertIsNotNone(db.make_db_link())
+                # a new object, after the valid link has been cached
+                self.assertRaises(ValueError, MongoDb(server=server, test=True, **{key: invalid}).make_db_link)
+                # the same object, after its link has been cached
+                db[key] = invalid
+                self.assertRaises(ValueError, db.make_db_link)
+
     def test_connection(self):
         """
         Run a unit test on the connection method
@@ -256,8 +294,8 @@ class TestMongoDb(TestCase):
         client = self.get_test_database()
         valid_cfg = client.get_configuration()
 
-        # test valid config
-        self.assertTrue(client.is_connected())
+        # test valid config, the connection is not established until first use
+        self.assertFalse(client.is_connected())
         connection = client.get_connection()
         self.assertIsNotNone(connection)
         self.assertTrue(client.is_connected())
@@ -284,5 +322,162 @@ class TestMongoDb(TestCase):
         client.close_connection()
 
 
+class TestMongoDbInsertMany(TestCase):
+    """
+    MongoDb.insert_many() tests, using a fake collection
+    """
+
+    CHUNK_SIZE = 3
+
+    def setUp(self):
+        for patcher in [patch.object(mongo_db_module, 'sleep'),
+                        patch.object(mongo_db_module, 'INSERT_CHUNK_SIZE', self.CHUNK_SIZE)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def insert_many(self, entries, collection, server=AZURE_SERVER):
+        with patch.object(MongoDb, 'get_collection', return_value=collection):
+            return MongoDb(server=server, test=True).insert_many(entries)
+
+    def test_list(self):
+        documents = make_documents(7)
+        collection = FakeCollection()
+        result = self.insert_many(documents, collection)
+        # sequences are inserted in a single request
+        self.assertEqual([documents], collection.requests)
+        self.assertEqual(list(range(7)), result.inserted_ids)
+        self.assertTrue(result.acknowledged)
+
+    def test_generator(self):
+        documents = make_documents(7)
+        collection = FakeCollection()
+        result = self.insert_many((document for document in documents), collection)
+        self.assertEqual([documents[0:3], documents[3:6], documents[6:]], collection.requests)
+        self.assertEqual(list(range(7)), result.inserted_ids)
+
+    def test_empty_generator(self):
+        collection = FakeCollection()
+        result = self.insert_many((document for document in []), collection)
+        self.assertEqual([], collection.requests)
+        self.assertEqual([], result.inserted_ids)
+
+    def test_error_in_first_chunk(self):
+        documents = make_documents(8)
+        collection = FakeCollection(errors={0: 4})
+        result = self.insert_many(documents, collection)
+        # ids of documents inserted before the error are unknown, remainder inserted in batches of a quarter of those
+        self.assertEqual([None] * 4 + list(range(4, 8)), result.inserted_ids)
+        self.assertEqual([documents[idx:idx + 1] for idx in range(4, 8)], collection.requests[1:])
+        self.assertEqual(documents, collection.inserted)
+
+    def test_error_in_later_chunk(self):
+        documents = make_documents(10)
+        collection = FakeCollection(errors={1: 2})
+        result = self.insert_many((document for document in documents), collection)
+        self.assertEqual([0, 1, 2, None, None] + list(range(5, 10)), result.inserted_ids)
+        # the rest of the failed chunk and the remaining chunks are inserted in batches
+        self.assertEqual([documents[idx:idx + 1] for idx in range(5, 10)], collection.requests[2:])
+        self.assertEqual(documents, collection.inserted)
+
+    def test_error_count_mismatch(self):
+        class MissingIdsCollection(FakeCollection):
+            def insert_many(self, documents):
+                result = super().insert_many(documents)
+                return InsertManyResult([], result.acknowledged)
+
+        collection = MissingIdsCollection(errors={0: 4})
+        with self.assertRaises(ValueError):
+            self.insert_many(make_documents(8), collection)
+
+    def test_error_not_azure(self):
+        for server, code in [('myserver', TOO_MANY_REQUESTS), (AZURE_SERVER, 11000)]:
+            with self.subTest(server=server, code=code):
+                collection = FakeCollection(errors={0: 1}, code=code)
+                with self.assertRaises(BulkWriteError):
+                    self.insert_many(make_documents(4), collection, server=server)
+                self.assertEqual(1, len(collection.requests))
+
+
+class TestMongoDbClientPool(TestCase):
+    """
+    MongoDb shared client tests, using a mock MongoClient
+    """
+
+    def setUp(self):
+        patcher = patch.object(mongo_db_module, 'MongoClient')
+        self.client_class = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutdown_pool)
+        self.client_class.side_effect = lambda *args, **kwargs: MagicMock()
+
+    def test_lazy_client(self):
+        db = MongoDb(server=values[server_idx])
+        # the configuration is validated, but the client isn't created until first use
+        self.client_class.assert_not_called()
+        client = db.get_connection()
+        self.client_class.assert_called_once_with(db.make_db_link(), retryWrites=False)
+        self.assertIs(client, db.get_connection())
+        self.client_class.assert_called_once()
+
+    def test_shared_client(self):
+        db = MongoDb(server=values[server_idx], test=True)
+        other = MongoDb(server=values[server_idx], test=True)
+        client = db.get_connection()
+        self.assertIs(client, other.get_connection())
+        self.client_class.assert_called_once()
+
+        # a different link gets a different client
+        self.assertIsNot(client, MongoDb(server='otherserver', test=True).get_connection())
+        self.assertEqual(2, self.client_class.call_count)
+
+        # closing a connection leaves the shared client open
+        db.close_connection()
+        self.assertIsNone(db.client)
+        client.close.assert_not_called()
+        self.assertIs(client, db.get_connection())
+
+    def test_shutdown_pool(self):
+        db = MongoDb(server=values[server_idx], test=True)
+        client = db.get_connection()
+        shutdown_pool()
+        client.close.assert_called_once_with()
+
+        # a new client is created after shutdown
+        db.close_connection()
+        self.assertIsNot(client, db.get_connection())
+        self.assertEqual(2, self.client_class.call_count)
+
+    def test_discard_client_on_operation_failure(self):
+        failing = MagicMock()
+        failing.server_info.side_effect = OperationFailure('Authentication failed')
+        self.client_class.side_effect = [failing, MagicMock()]
+
+        db = MongoDb(server=values[server_idx], test=True)
+        with LogCapture():
+            self.assertIsNone(db.get_connection())
+        # the unusable client is closed and removed from the pool, so the next connection gets a new client
+        failing.close.assert_called_once_with()
+        client = db.get_connection()
+        self.assertIsNotNone(client)
+        self.assertIsNot(failing, client)
+        self.assertEqual(2, self.client_class.call_count)
+
+    def test_failure_keeps_client_shared_with_others(self):
+        client = MagicMock()
+        client.server_info.side_effect = [{}, OperationFailure('Command failed'), {}]
+        self.client_class.side_effect = [client]
+
+        db = MongoDb(server=values[server_idx], test=True)
+        self.assertIs(client, db.get_connection())
+        other = MongoDb(server=values[server_idx], test=True)
+        with LogCapture():
+            self.assertIsNone(other.get_connection())
+        # the client is still held by the first object, so it isn't closed or removed from the pool
+        client.close.assert_not_called()
+        self.assertIs(client, db.client)
+        self.assertIs(client, MongoDb(server=values[server_idx], test=True).get_connection())
+        self.client_class.assert_called_once()
+
+
 if __name__ == '__main__':
     unittest.main()
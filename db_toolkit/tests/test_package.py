@@ -0,0 +1,45 @@
+# The MIT License (MIT)
+# Copyright (c) 2019 Ian Buttimer
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import importlib
+from unittest import TestCase
+import db_toolkit
+
+SUBPACKAGES = ('cosmosdb', 'mongo', 'postgres', 'misc')
+# subpackage names which are deliberately not exported at the top level, as they are ambiguous between subpackages
+NOT_EXPORTED = frozenset(('shutdown_pool',))
+
+
+class TestPackage(TestCase):
+    def test_exports(self):
+        """
+        Tests that the top level package exports the public names of the subpackages
+        """
+        expected = set()
+        for subpackage in SUBPACKAGES:
+            module = importlib.import_module(f'db_toolkit.{subpackage}')
+            for name in set(module.__all__) - NOT_EXPORTED:
+                expected.add(name)
+                with self.subTest(name=name):
+                    self.assertIs(getattr(module, name), getattr(db_toolkit, name))
+
+        self.assertEqual(expected, set(db_toolkit.__all__))
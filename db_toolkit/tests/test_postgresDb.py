@@ -22,10 +22,18 @@
 import unittest
 from unittest import TestCase
 from postgres.PostgresDb import PostgresDb
+from postgres.PostgresDb import shutdown_pool
+from postgres.PostgresDb import POOL_MAXCONN
 from io import StringIO
-from io import SEEK_SET
 from testfixtures import LogCapture
 from testfixtures import StringComparison
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.pool import PoolError
+from unittest.mock import (
+    MagicMock,
+    patch
+)
+import gc
 import os
 
 # indices of argument keys in PostgresDb.KEYS
@@ -45,6 +53,11 @@ values = (
     '3000'
 )
 
+# expected connection failure log messages
+_AUTH_FAIL = StringComparison(r'.*password authentication failed for user.*')
+_NOT_EXIST = StringComparison(r'.*does not exist.*')
+_HOST_FAIL = StringComparison(r'could not translate host name.*')
+
 
 class TestPostgresDb(TestCase):
     """
@@ -64,11 +77,8 @@ class TestPostgresDb(TestCase):
                         self.assertRaises(ValueError, PostgresDb, user=usr, password=passwd, dbname=db)
 
         # valid config file
-        str_io = StringIO()
-        str_io.write(' # this is a comment\n')
-        for idx in list(range(len(PostgresDb.KEYS))):
-            str_io.write(f'{PostgresDb.KEYS[idx]}= {values[idx]}\n')
-        str_io.seek(0, SEEK_SET)
+        str_io = StringIO(' # this is a comment\n' +
+                          ''.join([f'{key}= {value}\n' for key, value in zip(PostgresDb.KEYS, values)]))
 
         db = PostgresDb(user='fake usr', password='fake passwd', dbname='fake db')
 
@@ -77,56 +87,57 @@ class TestPostgresDb(TestCase):
 
         # test valid config file handle
         db._load_cfg_file(str_io)
-        for idx in list(range(len(PostgresDb.KEYS))):
-            self.assertEqual(db[PostgresDb.KEYS[idx]], values[idx])
+        for idx, key in enumerate(PostgresDb.KEYS):
+            self.assertEqual(db[key], values[idx])
 
         # test missing value
-        str_io.truncate(0)
-        str_io.seek(0, SEEK_SET)
-        str_io.write(f'user= \n')
-        self.assertRaises(ValueError, db._load_cfg_file, str_io)
+        self.assertRaises(ValueError, db._load_cfg_file, StringIO('user= \n'))
 
         # test missing key
-        str_io.truncate(0)
-        str_io.seek(0, SEEK_SET)
-        str_io.write(f'= value\n')
-        self.assertRaises(ValueError, db._load_cfg_file, str_io)
+        self.assertRaises(ValueError, db._load_cfg_file, StringIO('= value\n'))
 
         # invalid separator
-        str_io.truncate(0)
-        str_io.seek(0, SEEK_SET)
-        str_io.write(f'user: value\n')
-        self.assertRaises(ValueError, db._load_cfg_file, str_io)
+        self.assertRaises(ValueError, db._load_cfg_file, StringIO('user: value\n'))
 
         # unknown key/value
-        str_io.truncate(0)
-        str_io.seek(0, SEEK_SET)
-        str_io.write(f'unknown_key= value\n')
         with LogCapture() as log_cap:
-            db._load_cfg_file(str_io)
+            db._load_cfg_file(StringIO('unknown_key= value\n'))
             log_cap.check(
                 ('root', 'INFO', 'Ignoring unknown entry on line 1'),
             )
 
-        str_io.close()
-
         # test invalid config file path
         self.assertRaises(ValueError, PostgresDb, cfg_filename='doesnotexist')
         # test invalid config file argument type
         self.assertRaises(ValueError, PostgresDb, cfg_filename=['i am a list'])
 
+    @classmethod
+    def setUpClass(cls):
+        """
+        Create the test database object shared by the tests
+        Closed connections are kept open in the shared connection pool, so reopening a connection with the same settings
+        reuses it rather than reconnecting to the server.
+        """
+        cfg_filename = os.environ.get('POSTGRES_CFG')
+        cls.test_db = PostgresDb(cfg_filename=cfg_filename) if cfg_filename is not None else None
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.test_db is not None:
+            cls.test_db.close_connection()
+        shutdown_pool()
+
     def get_test_database(self):
         """
         Get the test database
         Note: a valid configuration file is required.
               Specify the path to the file in the environment variable POSTGRES_CFG.
         """
-        cfg_filename = os.environ.get('POSTGRES_CFG')
-        if cfg_filename is None:
+        if self.test_db is None:
             self.fail('Configuration file not set. '
                       'Please specify path to configuration file as environment variable POSTGRES_CFG')
 
-        return PostgresDb(cfg_filename=cfg_filename)
+        return self.test_db
 
     def test_connection(self):
         """
@@ -147,24 +158,23 @@ class TestPostgresDb(TestCase):
 
         # test erroneous connection config one argument at a time
         with LogCapture() as log_cap:
-            for idx in list(range(len(PostgresDb.KEYS))):
+            for idx, key in enumerate(PostgresDb.KEYS):
 
                 if idx == port_idx:
                     # TODO figure out way to test connection timeout, skip for now
                     continue
 
-                db[PostgresDb.KEYS[idx]] = values[idx]
+                db[key] = values[idx]
                 connection = db.get_connection()
                 self.assertIsNone(connection)
 
-                db[PostgresDb.KEYS[idx]] = valid_cfg[PostgresDb.KEYS[idx]]
+                db[key] = valid_cfg[key]
 
-            auth_failed_regex = r'.*password authentication failed for user.*'
             log_cap.check(
-                ('root', 'WARNING', StringComparison(auth_failed_regex)),
-                ('root', 'WARNING', StringComparison(auth_failed_regex)),
-                ('root', 'WARNING', StringComparison(r'.*does not exist.*')),
-                ('root', 'WARNING', StringComparison(r'could not translate host name.*'))
+                ('root', 'WARNING', _AUTH_FAIL),
+                ('root', 'WARNING', _AUTH_FAIL),
+                ('root', 'WARNING', _NOT_EXIST),
+                ('root', 'WARNING', _HOST_FAIL)
             )
 
     def test_cursor(self):
@@ -200,5 +210,96 @@ class TestPostgresDb(TestCase):
         db.close_connection()
 
 
+class TestPostgresDbPool(TestCase):
+    """
+    PostgresDb connection pool tests, using mock database connections
+    """
+
+    def setUp(self):
+        patcher = patch('psycopg2.connect', side_effect=self.connect)
+        self.connect_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutdown_pool)
+
+    @staticmethod
+    def connect(*args, **kwargs):
+        connection = MagicMock()
+        connection.closed = False
+        connection.info.transaction_status = TRANSACTION_STATUS_IDLE
+        return connection
+
+    @staticmethod
+    def get_test_database(pool_maxconn=POOL_MAXCONN):
+        return PostgresDb(user=values[user_idx], password=values[password_idx], dbname=values[dbname_idx],
+                          pool_maxconn=pool_maxconn)
+
+    def test_getconn_putconn(self):
+        db = self.get_test_database()
+        # connections are only opened when requested
+        self.connect_mock.assert_not_called()
+        connection = db.get_connection()
+        self.connect_mock.assert_called_once()
+        self.assertIs(connection, db.get_connection())
+        self.connect_mock.assert_called_once()
+
+        db.close_connection()
+        self.assertFalse(db.is_connected())
+        connection.close.assert_not_called()
+
+    def test_reuse(self):
+        db = self.get_test_database()
+        connection = db.get_connection()
+        db.close_connection()
+
+        # a connection put back in the pool is handed out again, to the same or another object with the same settings
+        self.assertIs(connection, db.get_connection())
+        db.close_connection()
+        self.assertIs(connection, self.get_test_database().get_connection())
+        self.connect_mock.assert_called_once()
+        connection.close.assert_not_called()
+
+    def test_reuse_up_to_maxconn(self):
+        dbs = [self.get_test_database(pool_maxconn=3) for _ in range(3)]
+        connections = [db.get_connection() for db in dbs]
+        for db in dbs:
+            db.close_connection()
+
+        # all the idle connections are kept open for reuse
+        self.assertEqual(set(map(id, connections)), {id(db.get_connection()) for db in dbs})
+        self.assertEqual(3, self.connect_mock.call_count)
+
+    def test_release_on_garbage_collection(self):
+        db = self.get_test_database()
+        connection = db.get_connection()
+        del db
+        gc.collect()
+        self.assertIs(connection, self.get_test_database().get_connection())
+        self.connect_mock.assert_called_once()
+
+    def test_pool_exhausted(self):
+        dbs = [self.get_test_database(pool_maxconn=2) for _ in range(2)]
+        for db in dbs:
+            db.get_connection()
+        db = self.get_test_database(pool_maxconn=2)
+        with self.assertRaisesRegex(PoolError, 'connection pool exhausted'):
+            db.get_connection()
+        self.assertFalse(db.is_connected())
+
+    def test_shutdown_pool(self):
+        db = self.get_test_database()
+        connection = db.get_connection()
+        shutdown_pool()
+        connection.close.assert_called_with()
+
+        # connections taken before shutdown are closed, rather than returned to the closed pool
+        connection.close.reset_mock()
+        db.close_connection()
+        connection.close.assert_called_once_with()
+
+        # a new pool is created after shutdown
+        self.assertIsNot(connection, db.get_connection())
+        self.assertEqual(2, self.connect_mock.call_count)
+
+
 if __name__ == '__main__':
     unittest.main()
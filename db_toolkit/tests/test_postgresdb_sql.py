@@ -0,0 +1,43 @@
+# The MIT License (MIT)
+# Copyright (c) 2019 Ian Buttimer
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from unittest import TestCase
+from psycopg2 import sql
+from postgres.postgresdb_sql import drop_table_sql
+
+
+def identifiers(composed):
+    """
+    Get the identifiers composed into a statement
+    :param composed: statement
+    :return: list of tuples of identifier strings
+    """
+    return [part.strings for part in composed if isinstance(part, sql.Identifier)]
+
+
+class TestPostgresDbSql(TestCase):
+    def test_drop_table_sql(self):
+        self.assertEqual([('mytable',)], identifiers(drop_table_sql('mytable')))
+        # schema-qualified names are composed as a qualified identifier, not a single quoted name
+        self.assertEqual([('myschema', 'mytable')], identifiers(drop_table_sql('myschema.mytable')))
+        # names are folded to lower case, as unquoted names are by PostgreSQL
+        self.assertEqual([('myschema', 'mytable')], identifiers(drop_table_sql('MySchema.MyTable')))
@@ -21,6 +21,8 @@
 
 from unittest import TestCase
 from cosmosdb.cosmosdb_sql import select
+from cosmosdb.cosmosdb_sql import select_template
+from cosmosdb.cosmosdb_sql import selection_key
 from cosmosdb.cosmosdb_sql import property_quote_if
 
 
@@ -47,6 +49,17 @@ class TestSelect(TestCase):
         self.assertEqual(f'SELECT * FROM {container_name} {alias} WHERE {alias}.{key} = {where[key]}',
                          select(container_name, selection, alias=alias, where=where))
 
+        # SELECT *
+        #     FROM Families f
+        #     WHERE f.id = "AndersenFamily" AND f.address.city = "Seattle"
+        where_and = {
+            "id": "AndersenFamily",
+            "address.city": "Seattle"
+        }
+        self.assertEqual(f'SELECT * FROM {container_name} {alias} WHERE {alias}.id = {where_and["id"]} AND '
+                         f'{alias}.address.city = {where_and["address.city"]}',
+                         select(container_name, selection, alias=alias, where=where_and))
+
         # SELECT f.id, f.address.city
         #     FROM Families f
         #     WHERE f.id = "AndersenFamily"
@@ -74,20 +87,45 @@ class TestSelect(TestCase):
             "address.city": property_quote_if(alias, "address.state")
         }
 
-        expected = 'SELECT {'
-        count = len(selection) - 1
-        for key in selection.keys():
-            expected += f'"{key}":{alias}.{selection[key]}'
-            if count > 0:
-                expected += ', '
-            count -= 1
-
+        columns = ', '.join([f'"{key}":{alias}.{value}' for key, value in selection.items()])
         key = list(where.keys())[0]
-        expected += '}' + f' AS {project} FROM {container_name} {alias} WHERE {alias}.{key} = {where[key]}'
+        expected = f'SELECT {{{columns}}} AS {project} FROM {container_name} {alias} WHERE {alias}.{key} = {where[key]}'
 
         self.assertEqual(expected, select(container_name, selection, alias=alias, project=project, where=where))
 
+    def test_select_where_value_types(self):
+        """
+        Tests that where values which compare equal but render differently don't share a cached statement
+        """
+        container_name = 'Families'
+        alias = 'f'
+        selection = ['id']
+        for value in (1, True, 1.0):
+            with self.subTest(value=value):
+                self.assertEqual(f'SELECT {alias}.id FROM {container_name} {alias} WHERE {alias}.a = {value}',
+                                 select(container_name, selection, alias=alias, where={'a': value}))
 
+    def test_select_template(self):
+        """
+        Tests for the parameterised select statement
+        """
+        # SELECT f.id, f.address.city
+        #     FROM Families f
+        #     WHERE f.id = @p0
+        container_name = 'Families'
+        alias = 'f'
+        selection = ['id', 'address.city']
+        sql, param_names = select_template(container_name, selection_key(selection), alias=alias, where_keys=('id',))
+        self.assertEqual(('@p0',), param_names)
+        self.assertEqual(select(container_name, selection, alias=alias, where={'id': '@p0'}), sql)
 
+        # the same shape of query shares the same statement
+        self.assertIs(sql, select_template(container_name, selection_key(list(selection)), alias=alias,
+                                           where_keys=('id',))[0])
 
-
+        # SELECT {"Name":f.id} AS Family
+        #     FROM Families f
+        selection = {'Name': 'id'}
+        sql, param_names = select_template(container_name, selection_key(selection), alias=alias, project='Family')
+        self.assertEqual((), param_names)
+        self.assertEqual(select(container_name, selection, alias=alias, project='Family'), sql)
@@ -6,13 +6,19 @@ _here = os.path.abspath(os.path.dirname(__file__))
 with open("README.md", "r") as fh:
     long_description = fh.read()
 
-version = {}
+# read the version without executing version.py
+version = None
 with open(os.path.join(_here, 'db_toolkit', 'version.py')) as f:
-    exec(f.read(), version)
+    for line in f:
+        if line.startswith('__version__'):
+            version = line.partition('=')[2].strip().strip('\'"')
+            break
+if not version:
+    raise RuntimeError('Unable to find __version__ in db_toolkit/version.py')
 
 setuptools.setup(
     name="db_toolkit",
-    version=version['__version__'],
+    version=version,
     author="Ian Buttimer",
     author_email="author@example.com",
     description="Database utility functions/classes",
@@ -22,17 +28,20 @@ setuptools.setup(
     license='MIT',
     packages=setuptools.find_packages(),
     install_requires=[
-      'azure-cosmos>=3.1.2',
+      'azure-cosmos>=4.6.0',
       'psycopg2>=2.8.4',
       'pymongo>=3.9.0',
-      'PyYAML>=3.13'
+      'PyYAML>=3.13',
+      'requests>=2.22.0'
     ],
-    tests_require=['testfixtures>=6.10.2'],
+    extras_require={
+      'test': ['testfixtures>=6.10.2', 'pytest', 'pytest-xdist']
+    },
     classifiers=[
         'Development Status :: 3 - Alpha',
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
-    python_requires='>=3.6',
+    python_requires='>=3.8',
 )